@@ -0,0 +1,307 @@
+import itertools
+import mmap
+import os
+from collections.abc import Iterator
+
+import igraph
+
+import numpy as np
+
+# the number of candidate ranks merged at once in a propagation round
+BLOCK = 1 << 20
+# the number of runs merged at once by build_csr
+FANIN = 64
+
+
+def to_csr(g: igraph.Graph | tuple[np.ndarray, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Converts a graph into compressed sparse rows, ignoring edge directions.
+    The neighbors of v are targets[offsets[v] : offsets[v + 1]].
+
+    @param g, a graph where the node ids are continuous, or (offsets, targets) already,
+        such as the memory-mapped arrays of load_csr
+    @returns (offsets, targets), an int64 array of N + 1 offsets and the neighbor ids
+    """
+
+    if isinstance(g, tuple):
+        return g
+
+    N, m = g.vcount(), g.ecount()
+    edges = np.fromiter(
+        itertools.chain.from_iterable(g.get_edgelist()), dtype=np.int64, count=2 * m
+    ).reshape(m, 2)
+
+    # every edge is stored in both directions
+    sources = np.concatenate([edges[:, 0], edges[:, 1]])
+    targets = np.concatenate([edges[:, 1], edges[:, 0]])
+    order = np.argsort(sources, kind="stable")
+
+    offsets = np.zeros(N + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=N), out=offsets[1:])
+    return offsets, targets[order].astype(_vertex_dtype(N))
+
+
+def build_csr(
+    path: str,
+    prefix: str,
+    binary: bool = False,
+    dtype: np.dtype = np.int32,
+    N: int | None = None,
+    chunk: int = 1 << 20,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Converts an edge list on disk into memory-mapped compressed sparse rows, like to_csr.
+    This is an external merge sort by source, chunk edges at a time:
+    one pass counts the degrees, another writes each chunk sorted by source as a run,
+    and runs are merged FANIN at a time until the last merge streams into the targets.
+    Besides O(N) for the degrees, only O(chunk) memory is used,
+    and every merge reads its runs sequentially.
+
+    @param path, the edge list, either text with a pair of ids in the first two columns of each line
+        (# and % start comments) or binary pairs of dtype
+    @param prefix, the output is written to prefix.offsets.npy and prefix.targets.npy
+    @param binary, whether the edge list is binary
+    @param dtype, the id type of a binary edge list
+    @param N, the number of vertices, defaults to the largest id + 1
+    @param chunk, the number of edges held in memory at once
+    @returns (offsets, targets), as in load_csr
+    """
+
+    degree = np.zeros(0 if N is None else N, dtype=np.int64)
+    for edges in _edge_chunks(path, binary, dtype, chunk):
+        counts = np.bincount(edges.ravel())
+        if len(counts) > len(degree):
+            degree = np.concatenate([degree, np.zeros(len(counts) - len(degree), dtype=np.int64)])
+        degree[: len(counts)] += counts
+    N = len(degree)
+    vertex = _vertex_dtype(N)
+
+    offsets = np.lib.format.open_memmap(f"{prefix}.offsets.npy", "w+", np.int64, (N + 1,))
+    offsets[0] = 0
+    np.cumsum(degree, out=offsets[1:])
+    del degree
+    offsets.flush()
+
+    # (source, target) pairs, every edge in both directions, sorted within each run
+    runs = []
+    try:
+        for edges in _edge_chunks(path, binary, dtype, chunk):
+            edges = edges.astype(vertex)
+            pairs = np.concatenate([edges, edges[:, ::-1]])
+            runs.append(f"{prefix}.run{len(runs)}.tmp")
+            pairs[np.argsort(pairs[:, 0])].tofile(runs[-1])
+
+        while len(runs) > FANIN:
+            merged = []
+            for i in range(0, len(runs), FANIN):
+                merged.append(f"{prefix}.run{len(runs) + len(merged)}.tmp")
+                with open(merged[-1], "wb") as f:
+                    _merge_runs(runs[i : i + FANIN], vertex, chunk, lambda pairs: pairs.tofile(f))
+                for run in runs[i : i + FANIN]:
+                    os.remove(run)
+            runs = merged
+
+        targets = np.lib.format.open_memmap(
+            f"{prefix}.targets.npy", "w+", vertex, (int(offsets[N]),)
+        )
+        end = 0
+
+        def write(pairs):
+            nonlocal end
+            targets[end : end + len(pairs)] = pairs[:, 1]
+            end = end + len(pairs)
+            # the pages are written once, so they are dropped as soon as they are on disk
+            targets.flush()
+            targets._mmap.madvise(mmap.MADV_DONTNEED)
+
+        _merge_runs(runs, vertex, chunk, write)
+    finally:
+        for run in runs:
+            if os.path.exists(run):
+                os.remove(run)
+
+    return load_csr(prefix)
+
+
+def load_csr(prefix: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Maps the compressed sparse rows written by build_csr, read-only.
+
+    @param prefix, the prefix given to build_csr
+    @returns (offsets, targets), which can be passed as the graph to the k-hop samplers
+    """
+
+    return (
+        np.load(f"{prefix}.offsets.npy", mmap_mode="r"),
+        np.load(f"{prefix}.targets.npy", mmap_mode="r"),
+    )
+
+
+def bottom_k_hop(
+    offsets: np.ndarray,
+    targets: np.ndarray,
+    ranks: np.ndarray,
+    n: int,
+    k: int,
+    block: int = BLOCK,
+) -> np.ndarray:
+    """
+    For each vertex v, finds the n smallest ranks in N_k(v) - {v}.
+    A round sorts O(n (N + m)) candidates, in blocks of vertices.
+
+    @param offsets, targets, the graph as compressed sparse rows
+    @param ranks, a permutation of 0..N-1 giving the order of the vertices
+    @param n, the sample size for each node
+    @param k, the neighborhood depth to sample from
+    @param block, the number of candidates to sort at once
+    @returns an N x n matrix of increasing ranks, padded with N
+    """
+
+    lists = None
+    for lists in bottom_hops(offsets, targets, ranks, n, k, block):
+        pass
+    return lists
+
+
+def bottom_hops(
+    offsets: np.ndarray,
+    targets: np.ndarray,
+    ranks: np.ndarray,
+    n: int,
+    k: int,
+    block: int = BLOCK,
+) -> Iterator[np.ndarray]:
+    """
+    Like bottom_k_hop, for every depth 1..k in one pass.
+    Each of the k rounds replaces the ranks of v with the smallest ranks of v and its neighbors,
+    so after round i they are the smallest ranks within distance i.
+
+    @param offsets, targets, the graph as compressed sparse rows
+    @param ranks, a permutation of 0..N-1 giving the order of the vertices
+    @param n, the sample size for each node
+    @param k, the largest neighborhood depth
+    @param block, the number of candidates to sort at once
+    @returns the N x n matrix of bottom_k_hop for each depth in order
+    """
+
+    N = len(offsets) - 1
+    ranks = np.asarray(ranks)
+    # one extra slot, since v is in its own lists until the end
+    lists = np.full((N, n + 1), N, dtype=_vertex_dtype(N + 1))
+    lists[:, 0] = ranks
+
+    converged = False
+    for _ in range(k):
+        if not converged:
+            merged = np.empty_like(lists)
+            _round(offsets, targets, lists, block, merged)
+            # once nothing changes, every ball already covers its whole component
+            converged = np.array_equal(merged, lists)
+            lists = merged
+
+        yield _without_self(lists, ranks, n)
+
+
+def _without_self(lists, ranks, n):
+    """the n smallest ranks of each row other than the vertex's own"""
+
+    N = len(lists)
+    out = np.where(lists == ranks[:, None], N, lists)
+    out.sort(axis=1)
+    return out[:, :n]
+
+
+def _round(offsets, targets, lists, block, out, start=0, stop=None):
+    """
+    writes the merged lists of the vertices start..stop-1 into the same rows of out
+    rows are only read from lists, so disjoint ranges of one round can be merged independently
+    """
+
+    N, m = lists.shape
+    end = N if stop is None else stop
+    out[start:end] = N
+
+    # the number of candidates up to and including each vertex: its row and one per neighbor
+    begin = start
+    ends = (offsets[begin + 1 : end + 1] + np.arange(begin + 1, end + 1)) * m
+    while start < end:
+        base = (offsets[start] + start) * m
+        stop = begin + int(np.searchsorted(ends, base + block, side="right"))
+        stop = min(max(start + 1, stop), end)
+
+        degree = np.diff(offsets[start : stop + 1])
+        rows = np.arange(stop - start, dtype=np.int64)
+        rows = np.concatenate([rows, np.repeat(rows, degree)])
+        values = np.concatenate(
+            [lists[start:stop], lists[targets[offsets[start] : offsets[stop]]]]
+        )
+
+        # a rank at or above the last of a full row cannot enter it
+        present = values < lists[start:stop, -1].astype(np.int64)[rows, None]
+        present[: stop - start] = values[: stop - start] < N
+        # sorting (row, rank) pairs packed into one integer groups each row's ranks in order
+        packed = (rows[:, None] * (N + 1) + values)[present]
+        packed.sort()
+        packed = packed[np.concatenate([[True], packed[1:] != packed[:-1]])]
+
+        row, value = np.divmod(packed, N + 1)
+        first = np.flatnonzero(np.concatenate([[True], row[1:] != row[:-1]]))
+        position = np.arange(len(row)) - np.repeat(first, np.diff(np.append(first, len(row))))
+        keep = position < m
+        out[start + row[keep], position[keep]] = value[keep]
+
+        if isinstance(targets, np.memmap):
+            # each block reads the next slice of a mapped graph once per round
+            targets._mmap.madvise(mmap.MADV_DONTNEED)
+        start = stop
+
+
+def _merge_runs(runs, vertex, chunk, write):
+    """
+    merges runs of (source, target) pairs sorted by source, passing the merged pairs to write in order
+    the runs share about 2 * chunk pairs of buffer, and each step takes every buffered pair up to
+    the smallest last buffered source, which empties at least one buffer
+    """
+
+    buffer = max(2 * chunk // max(len(runs), 1), 1 << 12)
+    files = [open(run, "rb") for run in runs]
+    try:
+        heads = [np.fromfile(f, vertex, 2 * buffer).reshape(-1, 2) for f in files]
+        while live := [i for i, head in enumerate(heads) if len(head)]:
+            bound = min(heads[i][-1, 0] for i in live)
+            parts = []
+            for i in live:
+                cut = np.searchsorted(heads[i][:, 0], bound, side="right")
+                parts.append(heads[i][:cut])
+                heads[i] = heads[i][cut:]
+                if not len(heads[i]):
+                    heads[i] = np.fromfile(files[i], vertex, 2 * buffer).reshape(-1, 2)
+            pairs = np.concatenate(parts)
+            write(pairs[np.argsort(pairs[:, 0], kind="stable")])
+    finally:
+        for f in files:
+            f.close()
+
+
+def _edge_chunks(path, binary, dtype, chunk):
+    """the edges of an edge list as (m, 2) int64 arrays of at most chunk edges"""
+
+    if binary:
+        with open(path, "rb") as f:
+            while len(edges := np.fromfile(f, dtype=dtype, count=2 * chunk)):
+                yield edges.astype(np.int64).reshape(-1, 2)
+        return
+
+    with open(path) as f:
+        while lines := f.readlines(16 * chunk):
+            lines = [line for line in lines if line.strip() and line.lstrip()[0] not in "#%"]
+            if lines:
+                # the ids are the first two columns, further columns such as weights are ignored,
+                # and a line with fewer than two integer columns raises a ValueError
+                yield np.loadtxt(
+                    lines, dtype=np.int64, comments=("#", "%"), usecols=(0, 1), ndmin=2
+                )
+
+
+def _vertex_dtype(N):
+    return np.int32 if N < np.iinfo(np.int32).max else np.int64
@@ -1,9 +1,12 @@
 import heapq
+from statistics import NormalDist
 
 import igraph
 
 import numpy as np
 
+from csr import bottom_hops, bottom_k_hop, to_csr
+
 
 def exp(theta=1):
     """
@@ -14,7 +17,7 @@ def exp(theta=1):
     return -theta * np.log(np.random.random())
 
 
-def sample_k_hop(g: igraph.Graph, n: int, k: int = 2) -> list[list[int]]:
+def sample_k_hop(g: igraph.Graph, n: int, k: int = 2) -> tuple[np.ndarray, np.ndarray]:
     """
     For each vertex, samples n nodes uniformly from the k-hop.
     This runs in O(k(nlogn + m)) time.
@@ -22,18 +25,30 @@ def sample_k_hop(g: igraph.Graph, n: int, k: int = 2) -> list[list[int]]:
     @param g, an undirected unweighted graph where the node ids are continuous
     @param n, the sample size for each node
     @param k, the neighborhood depth to sample from
-    @returns a list of samples S(v) subset N_k(v), where |S(v)| =  min(n, N_k(v))
+    @returns (samples, counts), where row v of the N x n int32 matrix samples
+        is S(v) subset N_k(v) padded with -1, and |S(v)| = counts[v] = min(n, N_k(v))
     """
 
     N = g.vcount()
-    samples = [list() for _ in range(N)]
+    samples = np.full((N, n), -1, dtype=np.int32)
+    counts = np.zeros(N, dtype=np.int64)
+    # stamp[u] == v means that v is in the sample of u
+    stamp = np.full(N, -1, dtype=np.int32)
 
     def _sample_k_hop():
         """One iteration of the algorithm (i.e. n = 1)"""
         h = g.copy()
 
+        # the vertices that have v in their sample are holders[starts[v] : starts[v + 1]]
+        # each v is popped once per iteration, so its holders only change after they are used
+        flat = samples.ravel()
+        order = np.argsort(flat, kind="stable")[np.count_nonzero(flat < 0) :]
+        holders = (order // n).astype(np.int32)
+        starts = np.zeros(N + 1, dtype=np.int64)
+        np.cumsum(np.bincount(flat[order], minlength=N), out=starts[1:])
+
         # trackers for what is already done
-        sampled = [False] * N
+        sampled = np.zeros(N, dtype=bool)
         removed = [False] * N
         # the heap with the random exponentially distributed weights
         heap = [(exp(), v) for v in range(N)]
@@ -41,19 +56,21 @@ def sample_k_hop(g: igraph.Graph, n: int, k: int = 2) -> list[list[int]]:
 
         while heap:
             # finding the smallest element
-            v = heapq.heappop(heap)
+            _, v = heapq.heappop(heap)
             if removed[v]:
                 continue
+            stamp[holders[starts[v] : starts[v + 1]]] = v
 
             # add v as the sample for u in S = N_k(v)
             S = h.neighborhood(v, order=k, mindist=1)
-            for u in S:
-                if sampled[u] or v in samples[u]:
-                    continue
-                samples[u].append(v)
-
-                # remove S + v from the heap
-                sampled[u] = True
+            fresh = np.array(S, dtype=np.int64)
+            fresh = fresh[~sampled[fresh] & (stamp[fresh] != v)]
+            samples[fresh, counts[fresh]] = v
+            counts[fresh] += 1
+
+            # remove S + v from the heap
+            sampled[fresh] = True
+            for u in fresh.tolist():
                 removed[u] = True
 
             # remove S + v from the edgelist
@@ -63,12 +80,135 @@ def sample_k_hop(g: igraph.Graph, n: int, k: int = 2) -> list[list[int]]:
     for _ in range(n):
         _sample_k_hop()
 
-    return samples
+    return samples, counts
+
+
+def sample_k_hop_csr(
+    g: igraph.Graph | tuple[np.ndarray, np.ndarray],
+    n: int,
+    k: int = 2,
+    rng: np.random.Generator | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For each vertex, samples n nodes uniformly from the k-hop, like sample_k_hop.
+    Instead of n passes over copies of g, the graph is converted to CSR once,
+    and every vertex keeps the n smallest ranks of one random order of the vertices,
+    which are propagated one hop at a time for k rounds in O(k(nlogn + m)) time.
+
+    @param g, an undirected unweighted graph where the node ids are continuous,
+        or its (offsets, targets) from to_csr or load_csr
+    @param n, the sample size for each node
+    @param k, the neighborhood depth to sample from
+    @param rng, the random generator for the order of the vertices
+    @returns (samples, counts), as in sample_k_hop
+    """
+
+    rng = np.random.default_rng() if rng is None else rng
+    offsets, targets = to_csr(g)
+
+    N = len(offsets) - 1
+    ranks = rng.permutation(N)
+    # the vertex of each rank, and nothing for the padding
+    vertices = np.empty(N + 1, dtype=np.int32)
+    vertices[ranks] = np.arange(N)
+    vertices[N] = -1
+
+    samples = vertices[bottom_k_hop(offsets, targets, ranks, n, k)]
+    return samples, np.count_nonzero(samples >= 0, axis=1)
+
+
+def save_samples(path: str, samples: np.ndarray):
+    """
+    Saves a sample matrix as a .npy file.
+
+    @param path, the file to write
+    @param samples, the N x n matrix from sample_k_hop, padded with -1
+    """
+
+    np.save(path, samples, allow_pickle=False)
+
+
+def load_samples(path: str, mmap: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Loads a sample matrix saved by save_samples.
+
+    @param path, the .npy file to read
+    @param mmap, whether to map the matrix read-only instead of reading it into memory
+    @returns (samples, counts), as in sample_k_hop
+    """
+
+    samples = np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+    # the padding is always at the end of a row
+    return samples, np.count_nonzero(samples >= 0, axis=1)
+
+
+def estimate_k_hop_sizes(
+    g: igraph.Graph | tuple[np.ndarray, np.ndarray],
+    k: int,
+    n: int,
+    rng: np.random.Generator | None = None,
+    all_radii: bool = False,
+    confidence: float = 0.95,
+) -> np.ndarray:
+    """
+    Estimates |N_k(v)| for each vertex from bottom-n samples (Cohen's estimator).
+    Each vertex gets an Exp(1) rank x, or equivalently a uniform rank u = 1 - e^-x.
+    If u is the n-th smallest uniform rank in N_k(v), then (n - 1) / u is unbiased
+    with a coefficient of variation of at most 1 / sqrt(n - 2),
+    and u * |N_k(v)| is about Gamma(n, 1) distributed, which gives the bounds.
+    Neighborhoods with fewer than n vertices are counted exactly.
+
+    @param g, an undirected unweighted graph where the node ids are continuous,
+        or its (offsets, targets) from to_csr or load_csr
+    @param k, the neighborhood depth
+    @param n, the sample size for each node, at least 2
+    @param rng, the random generator for the ranks
+    @param all_radii, whether to estimate for every depth 1..k in the same pass
+    @param confidence, the probability that the size is within the bounds
+    @returns an N x 3 array of (estimate, low, high), or k x N x 3 for all_radii
+    """
+
+    rng = np.random.default_rng() if rng is None else rng
+    offsets, targets = to_csr(g)
+
+    N = len(offsets) - 1
+    ranks = rng.permutation(N)
+    # the exponential rank of each position in the order, and infinity for the padding
+    keys = np.append(np.sort(rng.exponential(size=N)), np.inf)
+    # the gamma quantiles by wilson-hilferty
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    low = n * (1 - 1 / (9 * n) - z * np.sqrt(1 / (9 * n))) ** 3
+    high = n * (1 - 1 / (9 * n) + z * np.sqrt(1 / (9 * n))) ** 3
+
+    estimates = []
+    for lists in bottom_hops(offsets, targets, ranks, n, k):
+        u = -np.expm1(-keys[lists[:, -1]])
+        count = np.count_nonzero(lists < N, axis=1).astype(float)
+        full = u < 1
+        estimates.append(
+            np.stack(
+                [
+                    np.where(full, (n - 1) / u, count),
+                    np.where(full, np.maximum(low / u, n), count),
+                    np.where(full, high / u, count),
+                ],
+                axis=1,
+            )
+        )
+
+    return np.stack(estimates) if all_radii else estimates[-1]
 
 
 def main():
-    # TODO: do some sort of test
-    pass
+    # compare the estimated 2-hop sizes with the exact ones on a random graph
+    g = igraph.Graph.Erdos_Renyi(n=2000, m=6000)
+    k, n = 2, 32
+
+    exact = np.array([len(S) for S in g.neighborhood(order=k, mindist=1)])
+    estimates = estimate_k_hop_sizes(g, k, n, np.random.default_rng(0))
+    error = np.abs(estimates[:, 0] - exact) / np.maximum(exact, 1)
+    covered = (estimates[:, 1] <= exact) & (exact <= estimates[:, 2])
+    print(f"mean relative error {error.mean():.3f}, bounds cover {covered.mean():.3f}")
 
 
 if __name__ == "__main__":
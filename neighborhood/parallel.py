@@ -0,0 +1,123 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import igraph
+
+import numpy as np
+
+from csr import BLOCK, _round, _vertex_dtype, _without_self, to_csr
+
+# the graph and list arrays of a worker, attached to shared memory or mapped by _attach
+_graph = {}
+
+
+def sample_k_hop_parallel(
+    g: igraph.Graph | tuple[np.ndarray, np.ndarray],
+    n: int,
+    k: int = 2,
+    seed: int | None = None,
+    processes: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For each vertex, samples n nodes uniformly from the k-hop, like sample_k_hop_csr,
+    with each round of min-rank propagation split over a pool of processes.
+    The rows of a round only read the lists of the previous round, so ranges of rows
+    with about the same number of candidates are merged by the workers independently.
+    The CSR arrays of g are put in shared memory once, or mapped by every worker when they are
+    memory-mapped files, as from load_csr, and the lists of both rounds live in shared memory.
+    The random order comes from default_rng(seed), so the samples are the ones
+    sample_k_hop_csr gives with that generator, whatever the number of processes.
+
+    @param g, an undirected unweighted graph where the node ids are continuous,
+        or its (offsets, targets) from to_csr or load_csr
+    @param n, the sample size for each node
+    @param k, the neighborhood depth to sample from
+    @param seed, the entropy of the random order
+    @param processes, the size of the pool, defaults to the number of cores
+    @returns (samples, counts), as in sample_k_hop, where |S(v)| = min(n, N_k(v))
+    """
+
+    offsets, targets = to_csr(g)
+    N = len(offsets) - 1
+    ranks = np.random.default_rng(seed).permutation(N)
+    processes = processes or mp.cpu_count()
+
+    # one extra slot, since v is in its own lists until the end, as in bottom_hops
+    lists = np.full((N, n + 1), N, dtype=_vertex_dtype(N + 1))
+    lists[:, 0] = ranks
+
+    # a few ranges per process, to even out the load
+    weight = np.cumsum(np.diff(offsets) + 1)
+    total = weight[-1] if N else 0
+    bounds = np.searchsorted(weight, np.linspace(0, total, 4 * processes + 1)[1:-1])
+    bounds = np.unique(np.concatenate([[0], bounds, [N]]))
+
+    blocks, specs = zip(_share(offsets), _share(targets), _share(lists), _share(lists))
+    try:
+        with mp.Pool(processes, initializer=_attach, initargs=(specs,)) as pool:
+            current = 0
+            for _ in range(k):
+                ranges = [(current, start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+                pool.map(_rows, ranges)
+                current = 1 - current
+                # once nothing changes, every ball already covers its whole component
+                if np.array_equal(_lists(blocks, specs, 0), _lists(blocks, specs, 1)):
+                    break
+            lists = _lists(blocks, specs, current).copy()
+    finally:
+        for block in blocks:
+            if block is not None:
+                block.close()
+                block.unlink()
+
+    # the vertex of each rank, and nothing for the padding
+    vertices = np.empty(N + 1, dtype=np.int32)
+    vertices[ranks] = np.arange(N)
+    vertices[N] = -1
+
+    samples = vertices[_without_self(lists, ranks, n)]
+    return samples, np.count_nonzero(samples >= 0, axis=1)
+
+
+def _share(a):
+    """(shared memory block or None, how a worker opens the array)"""
+
+    if isinstance(a, np.memmap) and a.filename is not None:
+        # a mapped array, as from load_csr, is mapped again by the workers instead of copied
+        return None, ("file", a.filename, a.offset, a.shape, a.dtype.str)
+
+    block = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+    np.ndarray(a.shape, a.dtype, buffer=block.buf)[:] = a
+    return block, ("shared", block.name, a.shape, a.dtype.str)
+
+
+def _attach(specs):
+    # the blocks stay open for as long as the worker lives
+    _graph["blocks"] = []
+    arrays = []
+    for kind, name, *layout in specs:
+        if kind == "file":
+            offset, shape, dtype = layout
+            arrays.append(np.memmap(name, dtype, "r", offset, shape))
+        else:
+            shape, dtype = layout
+            block = shared_memory.SharedMemory(name=name)
+            _graph["blocks"].append(block)
+            arrays.append(np.ndarray(shape, dtype, buffer=block.buf))
+    _graph["offsets"], _graph["targets"], *_graph["lists"] = arrays
+
+
+def _rows(task):
+    """merges a range of rows from one list array into the other"""
+
+    current, start, stop = task
+    lists = _graph["lists"]
+    offsets, targets = _graph["offsets"], _graph["targets"]
+    _round(offsets, targets, lists[current], BLOCK, lists[1 - current], start, stop)
+
+
+def _lists(blocks, specs, i):
+    """the i-th list array, as seen by the parent"""
+
+    _, _, shape, dtype = specs[2 + i]
+    return np.ndarray(shape, dtype, buffer=blocks[2 + i].buf)
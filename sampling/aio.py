@@ -0,0 +1,136 @@
+import asyncio
+import heapq as q
+import time
+
+import numpy as np
+from reservoir import _jump
+
+
+class AsyncReservoir:
+    """
+    sample_botk or sample_jumps over an async source
+    the sample can be read with snapshot() while another task is consuming
+    """
+
+    def __init__(self, k, rng, jumps=False, yield_every=1 << 12):
+        self.k = k
+        self.rng = rng
+        self.jumps = jumps
+        # consume() gives other tasks a turn after this many items, even when
+        # the source never has to wait
+        self.yield_every = yield_every
+        self.reservoir = []
+        self.jump = 1
+        self.consumed = 0
+
+    def update(self, value):
+        reservoir = self.reservoir
+        self.consumed = self.consumed + 1
+        if len(reservoir) < self.k:
+            q.heappush(reservoir, (-self.rng.random(), value))
+            if self.jumps and len(reservoir) == self.k:
+                self.jump = _jump(-reservoir[0][0], self.rng)
+        elif not self.jumps:
+            key = self.rng.random()
+            if key < -reservoir[0][0]:
+                q.heappushpop(reservoir, (-key, value))
+        elif self.jump > 1:
+            self.jump = self.jump - 1
+        else:
+            key = -reservoir[0][0] * self.rng.random()
+            q.heappushpop(reservoir, (-key, value))
+            self.jump = _jump(-reservoir[0][0], self.rng)
+
+    def update_batch(self, values):
+        values = np.asarray(values)
+        start = 0
+        while len(self.reservoir) < self.k and start < len(values):
+            self.update(values[start])
+            start = start + 1
+        if start == len(values):
+            return
+        self.consumed = self.consumed + len(values) - start
+
+        reservoir = self.reservoir
+        if not self.jumps:
+            # only the keys below the threshold at the start of the chunk can enter
+            keys = self.rng.random(len(values) - start)
+            for i in np.flatnonzero(keys < -reservoir[0][0]):
+                if keys[i] < -reservoir[0][0]:
+                    q.heappushpop(reservoir, (-keys[i], values[start + i]))
+            return
+
+        # jump straight to the accepted positions of the chunk
+        index = start - 1 + self.jump
+        while index < len(values):
+            key = -reservoir[0][0] * self.rng.random()
+            q.heappushpop(reservoir, (-key, values[index]))
+            self.jump = _jump(-reservoir[0][0], self.rng)
+            index = index + self.jump
+        self.jump = index - len(values) + 1
+
+    async def consume(self, source, chunked=False):
+        """reads an async iterable of items, or of numpy chunks when chunked"""
+
+        update = self.update_batch if chunked else self.update
+        pending = 0
+        async for value in source:
+            update(value)
+            pending = pending + (len(value) if chunked else 1)
+            if pending >= self.yield_every:
+                pending = 0
+                await asyncio.sleep(0)
+        return self.sample()
+
+    async def snapshot(self):
+        return self.sample()
+
+    def sample(self):
+        return np.array([v for _, v in self.reservoir])
+
+
+async def sample_botk_async(source, k, rng, chunked=False):
+    """same as sample_botk, for an async iterable"""
+
+    return await AsyncReservoir(k, rng).consume(source, chunked)
+
+
+async def sample_jumps_async(source, k, rng, chunked=False):
+    """same as sample_jumps, for an async iterable"""
+
+    return await AsyncReservoir(k, rng, jumps=True).consume(source, chunked)
+
+
+async def _queue_source(queue):
+    while (value := await queue.get()) is not None:
+        yield value
+
+
+async def _demo(n, k, chunk):
+    queue = asyncio.Queue(maxsize=1 << 10)
+
+    async def produce():
+        for start in range(0, n, chunk):
+            await queue.put(np.arange(start, min(start + chunk, n)))
+        await queue.put(None)
+
+    reservoir = AsyncReservoir(k, np.random.default_rng(1234), jumps=True)
+    start = time.perf_counter()
+    producer = asyncio.create_task(produce())
+    consumer = asyncio.create_task(reservoir.consume(_queue_source(queue), chunked=True))
+    while not consumer.done():
+        snapshot = await reservoir.snapshot()
+        print(f"{reservoir.consumed} items read, {len(snapshot)} sampled")
+        await asyncio.sleep(0.1)
+    await producer
+
+    elapsed = time.perf_counter() - start
+    print(f"{n / elapsed:.3g} items/s, sample {np.sort(consumer.result())}")
+
+
+def main():
+    asyncio.run(_demo(10**8, 10, 1 << 14))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import argparse
+import csv
+import json
+import sys
+import time
+import tracemalloc
+from itertools import islice
+
+import numpy as np
+from instrument import CountingRNG
+from permute import sample_permute, sample_permute_bounded, sample_permute_known
+from reservoir import (
+    sample_botk,
+    sample_botk_chunks,
+    sample_botk_compact,
+    sample_jumps,
+    sample_jumps_compact,
+    sample_known_n,
+)
+from streams import CHUNK, stream_chunks, stream_items
+
+# name -> (kind of input the sampler reads, sampler(source, n, k, rng))
+SAMPLERS = {
+    "permute": ("items", lambda s, n, k, rng: sample_permute(s, k, rng)),
+    "permute_bounded": ("items", lambda s, n, k, rng: sample_permute_bounded(s, k, rng)),
+    "permute_known": ("items", lambda s, n, k, rng: sample_permute_known(s, n, k, rng)),
+    "botk": ("items", lambda s, n, k, rng: sample_botk(s, k, rng)),
+    "jumps": ("items", lambda s, n, k, rng: sample_jumps(s, k, rng)),
+    "botk_compact": ("items", lambda s, n, k, rng: sample_botk_compact(s, k, rng, np.int64)),
+    "jumps_compact": ("items", lambda s, n, k, rng: sample_jumps_compact(s, k, rng, np.int64)),
+    "botk_chunks": ("chunks", lambda s, n, k, rng: sample_botk_chunks(s, k, rng)),
+    "jumps_seek": ("seekable", lambda s, n, k, rng: sample_jumps(s, k, rng)),
+    "known_n": ("seekable", lambda s, n, k, rng: sample_known_n(s, n, k, rng)),
+}
+
+
+def _python_values(n, seed):
+    # the generator from plot_histogram
+    rng = np.random.default_rng(seed)
+    index = 0
+    while index < n:
+        yield int(rng.integers(n * n))
+        index += 1
+
+
+def make_source(name, kind, n, seed):
+    """
+    the stream of n values from the named source, in the form the sampler reads
+    python draws each value in a generator, the others are the distributions of
+    stream_chunks
+    """
+
+    if name == "python":
+        if kind == "items":
+            return _python_values(n, seed)
+        values = _python_values(n, seed)
+        if kind == "chunks":
+            return (
+                np.fromiter(islice(values, CHUNK), np.int64, min(CHUNK, n - start))
+                for start in range(0, n, CHUNK)
+            )
+        return np.fromiter(values, np.int64, n)
+
+    if kind == "items":
+        return stream_items(n, seed, name)
+    chunks = stream_chunks(n, seed, name)
+    if kind == "chunks":
+        return chunks
+    return np.concatenate([np.empty(0, np.int64), *chunks])
+
+
+def _materialize(source, kind):
+    if kind == "seekable":
+        return np.asarray(source)
+    return list(source)
+
+
+def _replay(stream, kind):
+    if kind == "seekable":
+        return stream
+    return iter(stream)
+
+
+def bench(sampler, source, n, k, reps, seed):
+    kind, collect = SAMPLERS[sampler]
+
+    # the source cost is producing the stream, and the sampler cost is
+    # consuming the same stream from memory
+    source_times = []
+    streams = []
+    for rep in range(reps):
+        start = time.perf_counter_ns()
+        streams.append(_materialize(make_source(source, kind, n, seed + rep), kind))
+        source_times.append(time.perf_counter_ns() - start)
+
+    times = []
+    rng = np.random.default_rng(seed)
+    for stream in streams:
+        stream = _replay(stream, kind)
+        start = time.perf_counter_ns()
+        collect(stream, n, k, rng)
+        times.append(time.perf_counter_ns() - start)
+
+    # memory and rng draws are measured on separate runs, since tracing slows them down
+    counting = CountingRNG(np.random.default_rng(seed))
+    stream = _replay(streams[0], kind)
+    tracemalloc.start()
+    collect(stream, n, k, counting)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    source_ns = float(np.median(source_times))
+    sampler_ns = float(np.median(times))
+    p50, p90, p99 = np.percentile(times, [50, 90, 99])
+    return {
+        "sampler": sampler,
+        "source": source,
+        "n": n,
+        "k": k,
+        "reps": reps,
+        "source_ms": source_ns / 1e6,
+        "sampler_ms": sampler_ns / 1e6,
+        "items_per_s": n / sampler_ns * 1e9,
+        "p50_ms": p50 / 1e6,
+        "p90_ms": p90 / 1e6,
+        "p99_ms": p99 / 1e6,
+        "peak_bytes": peak,
+        "draws_per_item": counting.draws / n,
+    }
+
+
+def compare(rows, baseline, tolerance):
+    """the rows whose throughput dropped by more than tolerance against the baseline"""
+
+    def key(row):
+        return (row["sampler"], row["source"], row["n"], row["k"])
+
+    before = {key(row): row for row in baseline}
+    regressions = []
+    for row in rows:
+        old = before.get(key(row))
+        if old is not None and row["items_per_s"] < (1 - tolerance) * old["items_per_s"]:
+            regressions.append((row, old))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark the samplers")
+    parser.add_argument("--n", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--k", type=int, nargs="+", default=[50])
+    parser.add_argument("--source", nargs="+", default=["python", "uniform"])
+    parser.add_argument("--sampler", nargs="+", default=list(SAMPLERS))
+    parser.add_argument("--reps", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--output", help="defaults to stdout")
+    parser.add_argument("--baseline", help="json output of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for sampler in args.sampler:
+        for source in args.source:
+            for n in args.n:
+                for k in args.k:
+                    rows.append(bench(sampler, source, n, k, args.reps, args.seed))
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    if args.format == "json":
+        json.dump(rows, out, indent=2)
+        out.write("\n")
+    else:
+        writer = csv.DictWriter(out, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    if args.output:
+        out.close()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(rows, json.load(f), args.tolerance)
+        for row, old in regressions:
+            print(
+                f"regression: {row['sampler']} on {row['source']} n={row['n']} k={row['k']}: "
+                f"{row['items_per_s']:.3g} items/s, was {old['items_per_s']:.3g}",
+                file=sys.stderr,
+            )
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import heapq as q
+
+import numpy as np
+
+
+class ByteBudgetReservoir:
+    """
+    bottom-k reservoir bounded by total payload size instead of item count
+    the sample is the longest run of smallest-key items whose sizes fit in the budget,
+    so once an item does not fit, no item with a larger key can ever fit again
+
+    with arena=True, bytes payloads are copied into one preallocated buffer of
+    2 * budget bytes, which is compacted when it fills up, and their size is their length in bytes
+    """
+
+    def __init__(self, budget, rng, arena=False):
+        self.budget = budget
+        self.rng = rng
+        self.nbytes = 0
+        self.threshold = np.inf
+        # max heap of (-key, size, payload), or (-key, size, offset) into the arena
+        self.reservoir = []
+
+        self.arena = bytearray(2 * budget) if arena else None
+        self._end = 0
+
+    def update(self, payload, size=None):
+        """size defaults to len(payload), or its length in bytes with an arena"""
+
+        key = self.rng.random()
+        if key < self.threshold:
+            self._insert(key, payload, size)
+
+    def update_batch(self, payloads, sizes=None):
+        keys = self.rng.random(len(payloads))
+        for i in np.flatnonzero(keys < self.threshold):
+            # the threshold only drops while the batch is inserted
+            if keys[i] < self.threshold:
+                payload = payloads[i]
+                self._insert(keys[i], payload, None if sizes is None else int(sizes[i]))
+
+    def sample(self):
+        """the payloads, in increasing key order"""
+
+        items = sorted(self.reservoir, reverse=True)
+        if self.arena is None:
+            return [payload for _, _, payload in items]
+        return [bytes(self.arena[offset : offset + size]) for _, size, offset in items]
+
+    def __len__(self):
+        return len(self.reservoir)
+
+    def _insert(self, key, payload, size):
+        if self.arena is not None:
+            nbytes = memoryview(payload).nbytes
+            if size is not None and size != nbytes:
+                # the slice assignment would resize the arena
+                raise ValueError(f"payload of {nbytes} bytes given size {size}")
+            size = nbytes
+        elif size is None:
+            size = len(payload)
+
+        if size > self.budget:
+            self.threshold = min(self.threshold, key)
+            self._evict()
+            return
+
+        if self.arena is not None:
+            if self._end + size > len(self.arena):
+                self._compact()
+            offset = self._end
+            self.arena[offset : offset + size] = memoryview(payload).cast("B")
+            self._end = offset + size
+            payload = offset
+
+        q.heappush(self.reservoir, (-key, size, payload))
+        self.nbytes = self.nbytes + size
+        self._evict()
+
+    def _evict(self):
+        reservoir = self.reservoir
+        while reservoir and (self.nbytes > self.budget or -reservoir[0][0] >= self.threshold):
+            key, size, _ = q.heappop(reservoir)
+            self.nbytes = self.nbytes - size
+            self.threshold = min(self.threshold, -key)
+
+    def _compact(self):
+        """moves the live payloads to the front of the arena"""
+
+        end = 0
+        # moving in offset order never overwrites a payload that is yet to move, and
+        # the heap is rewritten in place, since the keys (hence the heap order) do not change
+        reservoir = self.reservoir
+        for i in sorted(range(len(reservoir)), key=lambda i: reservoir[i][2]):
+            key, size, offset = reservoir[i]
+            self.arena[end : end + size] = self.arena[offset : offset + size]
+            reservoir[i] = (key, size, end)
+            end = end + size
+        self._end = end
@@ -0,0 +1,104 @@
+import json
+import os
+import time
+from itertools import islice
+
+import numpy as np
+
+
+class SamplerState:
+    """everything sample_botk and sample_jumps need to resume a stream"""
+
+    def __init__(self, reservoir=None, jump=1, consumed=0, rng=None):
+        # heap of (-key, value)
+        self.reservoir = [] if reservoir is None else reservoir
+        # pending jump of sample_jumps
+        self.jump = jump
+        # number of stream items already read
+        self.consumed = consumed
+        # rng.bit_generator.state at the time of the checkpoint
+        self.rng = rng
+
+
+class Checkpoint:
+    """saves the sampler state to path every `items` items or `seconds` seconds"""
+
+    def __init__(self, path, items=1 << 20, seconds=60):
+        self.path = path
+        self.items = items
+        self.seconds = seconds
+        # the stream is read in blocks of this size between checks
+        self.block = min(items, 1 << 16)
+        self._last_items = None
+        self._last_time = time.monotonic()
+
+    def due(self, consumed):
+        if self._last_items is None:
+            self._last_items = consumed
+        return (
+            consumed - self._last_items >= self.items
+            or time.monotonic() - self._last_time >= self.seconds
+        )
+
+    def save(self, state):
+        save(self.path, state)
+        self._last_items = state.consumed
+        self._last_time = time.monotonic()
+
+
+def save(path, state):
+    """writes the state atomically as an .npz file"""
+
+    keys = np.array([-key for key, _ in state.reservoir], dtype=float)
+    values = np.array([v for _, v in state.reservoir])
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            keys=keys,
+            values=values,
+            jump=state.jump,
+            consumed=state.consumed,
+            rng=json.dumps(state.rng),
+        )
+    os.replace(tmp, path)
+
+
+def load(path):
+    with np.load(path, allow_pickle=True) as data:
+        # the reservoir was saved in heap order, so it is still a heap
+        reservoir = [(-key, value) for key, value in zip(data["keys"], data["values"])]
+        return SamplerState(
+            reservoir,
+            int(data["jump"]),
+            int(data["consumed"]),
+            json.loads(str(data["rng"])),
+        )
+
+
+def skip(stream, n):
+    """an iterator over the stream past its first n items"""
+
+    if n and hasattr(stream, "advance"):
+        stream.advance(n)
+        return iter(stream)
+
+    stream = iter(stream)
+    next(islice(stream, n, n), None)
+    return stream
+
+
+def blocks(stream, state, checkpoint, rng):
+    """
+    reads the stream in blocks, saving the state between blocks when due
+    the sampler must store its own fields in state before asking for the next block
+    """
+
+    stream = skip(stream, state.consumed)
+    size = 1 << 16 if checkpoint is None else checkpoint.block
+    while block := list(islice(stream, size)):
+        yield block
+        state.consumed = state.consumed + len(block)
+        if checkpoint is not None and checkpoint.due(state.consumed):
+            state.rng = rng.bit_generator.state
+            checkpoint.save(state)
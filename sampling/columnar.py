@@ -0,0 +1,91 @@
+import numpy as np
+from sketch import ReservoirSketch
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def columns_of(batch):
+    """
+    the columns of a record batch as a dict of numpy arrays, without copying where possible
+    a batch is a numpy structured array, a dict of equal length arrays,
+    or a pyarrow RecordBatch or Table when pyarrow is installed
+    """
+
+    if isinstance(batch, np.ndarray) and batch.dtype.names is not None:
+        return {name: batch[name] for name in batch.dtype.names}
+    if isinstance(batch, dict):
+        columns = {name: np.asarray(column) for name, column in batch.items()}
+        if len({len(column) for column in columns.values()}) > 1:
+            raise ValueError("columns must have the same length")
+        return columns
+    if pa is not None and isinstance(batch, (pa.RecordBatch, pa.Table)):
+        return {
+            name: batch.column(name).to_numpy(zero_copy_only=False)
+            for name in batch.schema.names
+        }
+    raise TypeError(f"unsupported batch type {type(batch).__name__}")
+
+
+def sample_rows(batches, k, rng, hash_seed=None, id_column=None):
+    """
+    samples k rows from a stream of record batches
+    returns the sorted global row indices and a dict of the gathered columns;
+    batches are only kept while they hold sampled rows, and rows are copied once, at the end
+    every batch needs the same column names and dtype kinds, and each output column
+    has the common dtype of its held batches (so strings take the widest width)
+    with a hash_seed, keys are hashes of the id_column, which is required
+    """
+
+    if hash_seed is not None and id_column is None:
+        raise ValueError("sampling with a hash_seed needs an id_column")
+
+    sketch = ReservoirSketch(k, rng, hash_seed)
+    held = {}
+    schema = None
+    threshold = sketch.threshold
+    offset = 0
+    for number, batch in enumerate(batches):
+        columns = columns_of(batch)
+        kinds = {name: column.dtype.kind for name, column in columns.items()}
+        if schema is None:
+            schema = kinds
+        elif kinds != schema:
+            raise ValueError(f"batch {number} does not have the schema of the first batch")
+
+        n = len(next(iter(columns.values()), []))
+        rows = np.arange(offset, offset + n)
+        ids = None if hash_seed is None else columns[id_column]
+        # each candidate is (batch number, global row)
+        kept = sketch.update_batch(np.column_stack([np.full(n, number), rows]), record_ids=ids)
+        offset = offset + n
+        if kept:
+            held[number] = (columns, offset - n)
+
+        # rows only leave the sample when the sketch compacts, which lowers the threshold,
+        # so at most k batches with pending rows are held on top of the sampled ones
+        if sketch.threshold < threshold:
+            threshold = sketch.threshold
+            live = set(np.unique(sketch.sample()[:, 0]).tolist())
+            held = {b: held[b] for b in held if b in live}
+
+    picked = sketch.sample()
+    if len(picked) == 0:
+        return np.empty(0, dtype=np.int64), {}
+    picked = picked[np.argsort(picked[:, 1])]
+
+    out = {
+        name: np.empty(len(picked), np.result_type(*(c[name].dtype for c, _ in held.values())))
+        for name in schema
+    }
+    start = 0
+    for number in np.unique(picked[:, 0]):
+        columns, base = held[number]
+        rows = picked[picked[:, 0] == number, 1] - base
+        for name, column in columns.items():
+            np.take(column, rows, out=out[name][start : start + len(rows)])
+        start = start + len(rows)
+
+    return picked[:, 1], out
@@ -0,0 +1,111 @@
+import numpy as np
+
+
+class GroupedSketch:
+    """
+    bottom-k reservoir for every group of a stream of (group, value) chunks
+    group ids are small non-negative integers, and each group's reservoir is a row
+    of flat (groups, k) key and value arrays, filled from the left
+    """
+
+    def __init__(self, k, rng, groups=1 << 10):
+        self.k = k
+        self.rng = rng
+        self.keys = np.full((groups, k), np.inf)
+        self.values = None
+        # largest kept key of each group, inf while the group has fewer than k items
+        self.thresholds = np.full(groups, np.inf)
+        # number of filled slots of each group
+        self.counts = np.zeros(groups, dtype=np.int64)
+
+    def update_batch(self, groups, values):
+        groups = np.asarray(groups, dtype=np.int64)
+        values = np.asarray(values)
+        if len(groups) == 0:
+            return
+        if self.values is None:
+            self.values = np.zeros(self.keys.shape, values.dtype)
+        self._reserve(groups.max() + 1)
+
+        keys = self.rng.random(len(groups))
+        survivors = keys < self.thresholds[groups]
+        keys, groups, values = keys[survivors], groups[survivors], values[survivors]
+        if len(keys) == 0:
+            return
+
+        # sorting only by group is enough, since whichever survivors fill the empty
+        # slots, the rest are merged by key afterwards
+        order = np.argsort(groups, kind="stable")
+        keys, groups, values = keys[order], groups[order], values[order]
+        touched, starts, sizes = _runs(groups)
+        rank = np.arange(len(groups)) - np.repeat(starts, sizes)
+
+        # survivors that fit in the empty slots of their group are just written
+        slot = self.counts[groups] + rank
+        free = slot < self.k
+        self.keys[groups[free], slot[free]] = keys[free]
+        self.values[groups[free], slot[free]] = values[free]
+        self.counts[touched] = np.minimum(self.counts[touched] + sizes, self.k)
+
+        # the rest are merged with the (now full) rows of their group
+        rest = ~free
+        if rest.any():
+            self._merge(keys[rest], groups[rest], values[rest])
+
+        full = touched[self.counts[touched] == self.k]
+        self.thresholds[full] = self.keys[full].max(axis=1)
+
+    def _merge(self, keys, groups, values):
+        """inserts items into full rows, in rounds of at most one item per group"""
+
+        _, starts, sizes = _runs(groups)
+        if sizes.max() > self.k:
+            # only the k smallest keys of a group in this batch can enter its row
+            order = np.argsort(keys)
+            order = order[np.argsort(groups[order], kind="stable")]
+            rank = np.arange(len(groups)) - np.repeat(starts, sizes)
+            order = order[rank < self.k]
+            keys, groups, values = keys[order], groups[order], values[order]
+            _, starts, sizes = _runs(groups)
+
+        for r in range(sizes.max()):
+            items = starts[sizes > r] + r
+            rows = groups[items]
+            slots = self.keys[rows].argmax(axis=1)
+            better = keys[items] < self.keys[rows, slots]
+            items, rows, slots = items[better], rows[better], slots[better]
+            self.keys[rows, slots] = keys[items]
+            self.values[rows, slots] = values[items]
+
+    def sample(self, group):
+        if self.values is None or group >= len(self.keys):
+            return np.array([])
+        return self.values[group, : self.counts[group]]
+
+    def samples(self):
+        """the (groups, k) value matrix and the number of valid slots in each row"""
+
+        return self.values, self.counts
+
+    def _reserve(self, groups):
+        if groups <= len(self.keys):
+            return
+
+        size = max(groups, 2 * len(self.keys))
+        keys = np.full((size, self.k), np.inf)
+        keys[: len(self.keys)] = self.keys
+        values = np.zeros((size, self.k), self.values.dtype)
+        values[: len(self.values)] = self.values
+        thresholds = np.full(size, np.inf)
+        thresholds[: len(self.thresholds)] = self.thresholds
+        counts = np.zeros(size, dtype=np.int64)
+        counts[: len(self.counts)] = self.counts
+        self.keys, self.values, self.thresholds, self.counts = keys, values, thresholds, counts
+
+
+def _runs(groups):
+    """the distinct values of a sorted array, with where their runs start and their length"""
+
+    starts = np.flatnonzero(np.diff(groups, prepend=groups[0] - 1))
+    sizes = np.diff(starts, append=len(groups))
+    return groups[starts], starts, sizes
@@ -0,0 +1,68 @@
+import numpy as np
+
+
+class KeyHeap:
+    """
+    max heap of (key, value) pairs stored in preallocated numpy arrays
+    this replaces a heapq list of (-key, value) tuples for large reservoirs
+    """
+
+    def __init__(self, capacity, dtype=float):
+        self.keys = np.empty(capacity)
+        self.values = np.empty(capacity, dtype)
+        self.size = 0
+
+        # indexing a memoryview is much cheaper than indexing the array,
+        # but only plain numeric dtypes can be viewed this way
+        self._keys = self.keys.data
+        self._values = self.values
+        if self.values.dtype.kind in "biuf":
+            self._values = self.values.data
+
+    def __len__(self):
+        return self.size
+
+    def top(self):
+        """the largest key"""
+
+        return self._keys[0]
+
+    def append(self, key, value):
+        """adds a pair without restoring the heap order, see heapify"""
+
+        self._keys[self.size] = key
+        self._values[self.size] = value
+        self.size = self.size + 1
+
+    def heapify(self):
+        # keys sorted in decreasing order are a valid max heap
+        order = np.argsort(-self.keys[: self.size], kind="stable")
+        self.keys[: self.size] = self.keys[order]
+        self.values[: self.size] = self.values[order]
+
+    def replace(self, key, value):
+        """replaces the largest key"""
+
+        keys, values = self._keys, self._values
+        size = self.size
+        i = 0
+
+        # move the hole down until both children have smaller keys
+        while (child := 2 * i + 1) < size:
+            child_key = keys[child]
+            if child + 1 < size and keys[child + 1] > child_key:
+                child = child + 1
+                child_key = keys[child]
+            if child_key <= key:
+                break
+            keys[i] = child_key
+            values[i] = values[child]
+            i = child
+
+        keys[i] = key
+        values[i] = value
+
+    def sample(self):
+        """view of the values in the heap"""
+
+        return self.values[: self.size]
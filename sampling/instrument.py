@@ -0,0 +1,175 @@
+import heapq as q
+import time
+from enum import Enum, auto
+
+import numpy as np
+
+
+class Action(Enum):
+    # reading an element from the stream
+    READ = auto()
+    # generating a random number
+    RAND = auto()
+    # updating the reservoir in some way
+    UPDATE = auto()
+    # skipping elements of the stream without reading them
+    SKIP = auto()
+
+
+class CountingRNG:
+    """wraps a np.random.Generator, counting (and optionally timing) the random variates drawn"""
+
+    def __init__(self, rng, timing=False, callback=None):
+        self.rng = rng
+        self.timing = timing
+        self.callback = callback
+        self.draws = 0
+        self.ns = 0
+
+    def __getattr__(self, name):
+        method = getattr(self.rng, name)
+        if not callable(method):
+            return method
+
+        def counted(*args, **kwargs):
+            if self.timing:
+                start = time.perf_counter_ns()
+                out = method(*args, **kwargs)
+                self.ns = self.ns + time.perf_counter_ns() - start
+            else:
+                out = method(*args, **kwargs)
+            self.draws = self.draws + np.size(out)
+            if self.callback is not None:
+                self.callback(Action.RAND, out)
+            return out
+
+        return counted
+
+
+class Instruments:
+    """
+    counters and an optional callback(action, value) for one run of sample_botk or sample_jumps
+    the samplers only take the instrumented path when they are given one,
+    and the counters are reset at the start of every run
+    """
+
+    def __init__(self, callback=None, timing=False):
+        self.callback = callback
+        self.timing = timing
+        self._reset()
+
+    def _reset(self):
+        self.items_read = 0
+        self.items_skipped = 0
+        self.heap_pushes = 0
+        self.heap_replacements = 0
+        self.heap_ns = 0
+        self._rng = None
+
+    @property
+    def keys_drawn(self):
+        return 0 if self._rng is None else self._rng.draws
+
+    @property
+    def rng_ns(self):
+        return 0 if self._rng is None else self._rng.ns
+
+    def counters(self):
+        return {
+            "items_read": self.items_read,
+            "items_skipped": self.items_skipped,
+            "keys_drawn": self.keys_drawn,
+            "heap_pushes": self.heap_pushes,
+            "heap_replacements": self.heap_replacements,
+            "rng_ns": self.rng_ns,
+            "heap_ns": self.heap_ns,
+        }
+
+    def wrap(self, stream, rng):
+        """instrumented (stream, rng, heappush, heappushpop) for a sampler to use"""
+
+        self._reset()
+        self._rng = CountingRNG(rng, self.timing, self.callback)
+        if hasattr(stream, "__getitem__") and hasattr(stream, "__len__"):
+            stream = _CountedSource(stream, self)
+        else:
+            stream = _CountedStream(stream, self)
+        return stream, self._rng, self._heap_op(q.heappush), self._heap_op(q.heappushpop)
+
+    def _heap_op(self, op):
+        push = op is q.heappush
+
+        def counted(heap, item):
+            if self.timing:
+                start = time.perf_counter_ns()
+                out = op(heap, item)
+                self.heap_ns = self.heap_ns + time.perf_counter_ns() - start
+            else:
+                out = op(heap, item)
+
+            if push:
+                self.heap_pushes = self.heap_pushes + 1
+            else:
+                self.heap_replacements = self.heap_replacements + 1
+            if self.callback is not None:
+                self.callback(Action.UPDATE, heap)
+            return out
+
+        return counted
+
+    def _read(self, value):
+        self.items_read = self.items_read + 1
+        if self.callback is not None:
+            self.callback(Action.READ, value)
+
+    def _skip(self, n):
+        self.items_skipped = self.items_skipped + n
+        if self.callback is not None:
+            self.callback(Action.SKIP, n)
+
+
+class _CountedStream:
+    def __init__(self, stream, instruments):
+        self.length = len(stream) if hasattr(stream, "__len__") else None
+        # advance is called on the stream itself, as the samplers do, not on its iterator
+        self.source = stream
+        self.stream = iter(stream)
+        self.instruments = instruments
+        if hasattr(stream, "advance"):
+            self.advance = self._advance
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            value = next(self.stream)
+        except StopIteration:
+            if self.length is not None:
+                # the last jump can run past the end of the stream
+                instruments = self.instruments
+                skipped = self.length - instruments.items_read
+                instruments.items_skipped = min(instruments.items_skipped, skipped)
+            raise
+        self.instruments._read(value)
+        return value
+
+    def _advance(self, n):
+        # streams can return how many items they actually skipped, since the last jump
+        # can run past the end, otherwise it is counted in full unless the stream has a length
+        skipped = self.source.advance(n)
+        self.instruments._skip(n if skipped is None else skipped)
+
+
+class _CountedSource:
+    def __init__(self, source, instruments):
+        self.source = source
+        self.instruments = instruments
+
+    def __len__(self):
+        return len(self.source)
+
+    def __getitem__(self, index):
+        value = self.source[index]
+        self.instruments._read(value)
+        return value
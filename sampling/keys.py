@@ -0,0 +1,56 @@
+import hashlib
+
+import numpy as np
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def mix64(x):
+    """the splitmix64 finalizer, a bijection on uint64 with full avalanche"""
+
+    x = np.asarray(x, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def hash64(items, seed):
+    """
+    64-bit hashes of the items under the seed, the same in every process and run
+    numbers are hashed with mix64, rows of a 2d array are folded column by column,
+    and anything else goes through blake2b one item at a time
+    """
+
+    items = np.asarray(items)
+    with np.errstate(over="ignore"):
+        h = mix64(np.uint64(seed) + _GOLDEN)
+    if items.dtype.kind in "biu":
+        words = items.astype(np.uint64)
+    elif items.dtype.kind == "f":
+        words = items.astype(np.float64).view(np.uint64)
+    else:
+        key = int(h).to_bytes(8, "little")
+        digests = [
+            hashlib.blake2b(_bytes(item), digest_size=8, key=key).digest()
+            for item in items.ravel()
+        ]
+        return np.frombuffer(b"".join(digests), dtype=np.uint64).reshape(items.shape)
+
+    if words.ndim == 1:
+        return mix64(words ^ h)
+    for column in words.reshape(len(words), -1).T:
+        h = mix64(column ^ h)
+    return h
+
+
+def unit(hashes):
+    """maps 64-bit hashes to keys uniform in [0, 1)"""
+
+    return (np.asarray(hashes, dtype=np.uint64) >> np.uint64(11)) * 2.0**-53
+
+
+def _bytes(item):
+    if isinstance(item, bytes):
+        return item
+    return str(item).encode()
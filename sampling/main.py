@@ -4,22 +4,16 @@ import numpy as np
 from matplotlib import pyplot as plt
 from permute import sample_permute
 from reservoir import sample_botk, sample_jumps
+from streams import stream_items
 
 
 def plot_histogram(seed, collect, n, k, rep=100):
-    def generate_stream(n):
-        rng = np.random.default_rng(seed)
-        index = 0
-        while index < n:
-            yield (index, rng.integers(n * n))
-            index += 1
-
     counts = np.zeros(n)
     runtime = []
     rng = np.random.default_rng(seed)
     for _ in range(rep):
         start = time.perf_counter_ns()
-        sample = collect(generate_stream(n), k, rng)
+        sample = collect(stream_items(n, seed, indexed=True), k, rng)
         end = time.perf_counter_ns()
 
         runtime.append(end - start)
@@ -1,4 +1,50 @@
+import numpy as np
+
+
 def sample_permute(stream, k, rng):
     arr = list(stream)
     arr = rng.permutation(arr)
     return arr[:k]
+
+
+def sample_permute_bounded(stream, k, rng):
+    """same as sample_permute, but only keeps a buffer of k items"""
+
+    # a partial fisher-yates, where swaps past the buffer are dropped
+    buffer = []
+    for index, value in enumerate(stream):
+        if index < k:
+            buffer.append(value)
+            continue
+
+        swap = rng.integers(index + 1)
+        if swap < k:
+            buffer[swap] = value
+
+    return rng.permutation(buffer)
+
+
+def sample_permute_known(stream, n, k, rng):
+    """same as sample_permute, when the stream is known to have n items"""
+
+    # a partial fisher-yates over the indices, storing only the swapped entries
+    m = min(k, n)
+    swaps = {}
+    for i in range(m):
+        j = int(rng.integers(i, n))
+        swaps[i], swaps[j] = swaps.get(j, j), swaps.get(i, i)
+    indices = [swaps.get(i, i) for i in range(m)]
+
+    if hasattr(stream, "__getitem__"):
+        return np.array([stream[i] for i in indices])
+
+    position = {index: i for i, index in enumerate(indices)}
+    out = [None] * m
+    last = max(indices, default=-1)
+    for index, value in enumerate(stream):
+        if index > last:
+            break
+        if index in position:
+            out[position[index]] = value
+
+    return np.array(out)
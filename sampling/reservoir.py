@@ -1,43 +1,319 @@
 import heapq as q
 
 import numpy as np
+from checkpoint import SamplerState
+from checkpoint import blocks as checkpoint_blocks
+from checkpoint import skip
+from heap import KeyHeap
+from sketch import ReservoirSketch
 
 
-def sample_botk(stream, k, rng):
-    """simple reservoir algorithm"""
+def _resume(state, rng):
+    if state is None:
+        return SamplerState()
+    if state.rng is not None:
+        rng.bit_generator.state = state.rng
+    return state
+
+
+def sample_botk(stream, k, rng, state=None, checkpoint=None, instruments=None):
+    """
+    simple reservoir algorithm
+    state resumes from a saved SamplerState, and checkpoint periodically saves it
+    instruments collects counters and events, at the cost of the fast path
+    """
+
+    push, pushpop = q.heappush, q.heappushpop
+    if instruments is not None:
+        stream, rng, push, pushpop = instruments.wrap(stream, rng)
 
     reservoir = []
-    for value in stream:
-        key = rng.random()
-        item = (-key, value)
-        if len(reservoir) < k:
-            q.heappush(reservoir, item)
-        elif key < -reservoir[0][0]:
-            q.heappushpop(reservoir, item)
+    blocks = [stream]
+    if state is not None or checkpoint is not None:
+        state = _resume(state, rng)
+        reservoir = state.reservoir
+        blocks = checkpoint_blocks(stream, state, checkpoint, rng)
+
+    for block in blocks:
+        for value in block:
+            key = rng.random()
+            item = (-key, value)
+            if len(reservoir) < k:
+                push(reservoir, item)
+            elif key < -reservoir[0][0]:
+                pushpop(reservoir, item)
 
     return np.array([v for _, v in reservoir])
 
 
-def sample_jumps(stream, k, rng):
+def _jump(max_key, rng):
+    """number of items until the next one with key < max_key"""
+
+    return int(np.ceil(np.log(rng.random()) / np.log(1 - max_key)))
+
+
+def sample_jumps(stream, k, rng, state=None, checkpoint=None, instruments=None):
     """same as sample_botk, but with geometric jumps"""
 
+    push, pushpop, skip = q.heappush, q.heappushpop, None
+    if instruments is not None:
+        stream, rng, push, pushpop = instruments.wrap(stream, rng)
+        skip = instruments._skip
+
+    if hasattr(stream, "__getitem__") and hasattr(stream, "__len__"):
+        state = _resume(state, rng)
+        return _sample_jumps_seek(stream, k, rng, state, checkpoint, push, pushpop, skip)
+
+    # iterators that can skip ahead without yielding the skipped items
+    advance = getattr(stream, "advance", None)
+
     reservoir = []
     jump = 1
+    # items read but jumped over, reported once their jump is done
+    jumped = 0
+    blocks = [stream]
+    if state is not None or checkpoint is not None:
+        state = _resume(state, rng)
+        reservoir = state.reservoir
+        jump = state.jump
+        blocks = checkpoint_blocks(stream, state, checkpoint, rng)
+        # the blocks are read ahead, so they can not be skipped
+        advance = None
+
+    for block in blocks:
+        for value in block:
+            if len(reservoir) < k:
+                key = rng.random()
+                item = (-key, value)
+                push(reservoir, item)
+                if len(reservoir) < k:
+                    continue
+            elif jump > 1:
+                jump = jump - 1
+                if skip is not None:
+                    jumped = jumped + 1
+                    if jump == 1:
+                        skip(jumped)
+                        jumped = 0
+                continue
+            else:
+                # key ~ U(0, max_key)
+                max_key = -reservoir[0][0]
+                key = max_key * rng.random()
+                item = (-key, value)
+                pushpop(reservoir, item)
+
+            jump = _jump(-reservoir[0][0], rng)
+            if advance is not None and jump > 1:
+                advance(jump - 1)
+                jump = 1
+
+        if state is not None:
+            state.jump = jump
+
+    if jumped:
+        # the stream ended during a jump
+        skip(jumped)
+
+    return np.array([v for _, v in reservoir])
+
+
+def _sample_jumps_seek(source, k, rng, state, checkpoint, push, pushpop, skip=None):
+    """
+    sample_jumps over a random access source, reading only the sampled items
+    skip(n) is called for every jump, with the number of items it passes over
+    """
+
+    n = len(source)
+    reservoir = state.reservoir
+    filling = len(reservoir) < k
+    while len(reservoir) < k and state.consumed < n:
+        push(reservoir, (-rng.random(), source[state.consumed]))
+        state.consumed = state.consumed + 1
+    if len(reservoir) < k or not reservoir:
+        return np.array([v for _, v in reservoir])
+    if filling:
+        state.jump = _jump(-reservoir[0][0], rng)
+
+    # the item after the last one read, plus the pending jump
+    while (index := state.consumed - 1 + state.jump) < n:
+        if skip is not None and state.jump > 1:
+            skip(state.jump - 1)
+        max_key = -reservoir[0][0]
+        key = max_key * rng.random()
+        pushpop(reservoir, (-key, source[index]))
+
+        state.consumed = index + 1
+        state.jump = _jump(-reservoir[0][0], rng)
+        if checkpoint is not None and checkpoint.due(state.consumed):
+            state.rng = rng.bit_generator.state
+            checkpoint.save(state)
+
+    if skip is not None and state.consumed < n:
+        # the last jump runs past the end
+        skip(n - state.consumed)
+    return np.array([v for _, v in reservoir])
+
+
+def sample_known_n(source, n, k, rng):
+    """
+    samples k of the n items of the source without keys or a heap (vitter's method D)
+    the items come out in stream order, and seekable sources are only read at the sampled positions
+    """
+
+    indices = _method_d(n, k, rng)
+    if hasattr(source, "__getitem__") and hasattr(source, "__len__"):
+        return np.array([source[i] for i in indices])
+
+    out = []
+    position = 0
+    stream = iter(source)
+    for index in indices:
+        stream = skip(stream, index - position)
+        out.append(next(stream))
+        position = index + 1
+
+    return np.array(out)
+
+
+def _method_d(n, k, rng):
+    """the sorted indices of a uniform k subset of range(n), in O(k) expected time"""
+
+    if k >= n:
+        return list(range(n))
+    if k <= 0:
+        return []
+
+    indices = []
+    index = -1
+    # vitter switches to method A once k is a large fraction of n
+    alpha = 13
+    threshold = alpha * k
+    k_inv = 1 / k
+    v = np.exp(np.log(rng.random()) * k_inv)
+    # number of records left that can still be skipped, plus one
+    q1 = n - k + 1
+    while k > 1 and threshold < n:
+        k1_inv = 1 / (k - 1)
+        while True:
+            # x is a guess for the skip from the continuous approximation
+            while True:
+                x = n * (1 - v)
+                s = int(x)
+                if s < q1:
+                    break
+                v = np.exp(np.log(rng.random()) * k_inv)
+
+            y1 = np.exp(np.log(rng.random() * n / q1) * k1_inv)
+            v = y1 * (1 - x / n) * (q1 / (q1 - s))
+            if v <= 1:
+                break
+
+            # the exact acceptance test
+            y2 = 1.0
+            top = n - 1
+            if k - 1 > s:
+                bottom = n - k
+                limit = n - s
+            else:
+                bottom = n - s - 1
+                limit = q1
+            for _ in range(n - 1, limit - 1, -1):
+                y2 = y2 * top / bottom
+                top = top - 1
+                bottom = bottom - 1
+            if n / (n - x) >= y1 * np.exp(np.log(y2) * k1_inv):
+                v = np.exp(np.log(rng.random()) * k1_inv)
+                break
+            v = np.exp(np.log(rng.random()) * k_inv)
+
+        index = index + s + 1
+        indices.append(index)
+        n = n - s - 1
+        k = k - 1
+        k_inv = k1_inv
+        q1 = q1 - s
+        threshold = threshold - alpha
+
+    if k > 1:
+        # method A
+        top = n - k
+        while k >= 2:
+            u = rng.random()
+            s = 0
+            quot = top / n
+            while quot > u:
+                s = s + 1
+                top = top - 1
+                n = n - 1
+                quot = quot * top / n
+            index = index + s + 1
+            indices.append(index)
+            n = n - 1
+            k = k - 1
+        s = int(n * rng.random())
+    else:
+        s = int(n * v)
+
+    if k == 1:
+        indices.append(index + s + 1)
+    return indices
+
+
+def sample_botk_chunks(chunks, k, rng, hash_seed=None):
+    """
+    same as sample_botk, but consumes the stream as numpy chunks
+    with a hash_seed, keys are hashes of record ids instead of draws from rng;
+    a chunk can be an (ids, values) pair, and the ids default to positions in the stream
+    """
+
+    sketch = ReservoirSketch(k, rng, hash_seed)
+    position = 0
+    for chunk in chunks:
+        if isinstance(chunk, tuple):
+            ids, chunk = chunk
+        else:
+            ids = np.arange(position, position + len(chunk))
+        position = position + len(chunk)
+        sketch.update_batch(chunk, None if hash_seed is None else ids)
+
+    return sketch.sample()
+
+
+def sample_botk_compact(stream, k, rng, dtype=float):
+    """same as sample_botk, but the reservoir is a KeyHeap of the given dtype"""
+
+    reservoir = KeyHeap(k, dtype)
+    for value in stream:
+        key = rng.random()
+        if len(reservoir) < k:
+            reservoir.append(key, value)
+            if len(reservoir) == k:
+                reservoir.heapify()
+        elif key < reservoir.top():
+            reservoir.replace(key, value)
+
+    return reservoir.sample()
+
+
+def sample_jumps_compact(stream, k, rng, dtype=float):
+    """same as sample_jumps, but the reservoir is a KeyHeap of the given dtype"""
+
+    reservoir = KeyHeap(k, dtype)
+    jump = 1
     for value in stream:
         if len(reservoir) < k:
-            key = rng.random()
-            item = (-key, value)
-            q.heappush(reservoir, item)
+            reservoir.append(rng.random(), value)
+            if len(reservoir) < k:
+                continue
+            reservoir.heapify()
         elif jump > 1:
             jump = jump - 1
+            continue
         else:
             # key ~ U(0, max_key)
-            max_key = -reservoir[0][0]
-            key = max_key * rng.random()
-            item = (-key, value)
-            q.heappushpop(reservoir, item)
+            reservoir.replace(reservoir.top() * rng.random(), value)
 
-            max_key = -reservoir[0][0]
-            jump = int(np.ceil(np.log(rng.random()) / np.log(1 - max_key)))
+        jump = _jump(reservoir.top(), rng)
 
-    return np.array([v for _, v in reservoir])
+    return reservoir.sample()
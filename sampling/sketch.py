@@ -0,0 +1,287 @@
+from multiprocessing import Pool
+from statistics import NormalDist
+
+import numpy as np
+from keys import hash64, unit
+
+
+class ReservoirSketch:
+    """
+    bottom-k reservoir that keeps its keys, so it can be merged
+    with a hash_seed, the key of a record is a hash of its id instead of a random draw,
+    so the sample does not depend on the order or sharding of the stream,
+    and sketches with the same hash_seed are coordinated;
+    records with equal ids are the same record and kept once, so when the ids default
+    to the values, this samples distinct values
+    """
+
+    def __init__(self, k, rng, hash_seed=None):
+        self.k = k
+        self.rng = rng
+        self.hash_seed = hash_seed
+        self.keys = np.empty(0)
+        self.values = None
+        # items that passed the threshold but are not merged in yet
+        self._pending_keys = []
+        self._pending_values = []
+        self._pending = 0
+        # nothing passes the threshold of an empty reservoir
+        self.threshold = np.inf if k > 0 else -np.inf
+
+    def update(self, value, record_id=None):
+        """record_id defaults to the value itself, and is only used with a hash_seed"""
+
+        if self.hash_seed is None:
+            key = self.rng.random()
+        else:
+            key = self._keys(np.array([value if record_id is None else record_id]))[0]
+        if key < self.threshold:
+            self._push(np.array([key]), np.array([value]))
+
+    def update_batch(self, values, record_ids=None):
+        """returns the number of values that passed the threshold"""
+
+        values = np.asarray(values)
+        keys = self._keys(values if record_ids is None else record_ids)
+        survivors = keys < self.threshold
+        if not survivors.all():
+            keys, values = keys[survivors], values[survivors]
+        if len(keys):
+            self._push(keys, values)
+        return len(keys)
+
+    def merge(self, other):
+        """the bottom-k of the union of both streams"""
+
+        other._compact()
+        if other.values is not None:
+            self._push(other.keys, other.values)
+        self._compact()
+        return self
+
+    def sample(self):
+        self._compact()
+        if self.values is None:
+            return np.array([])
+        return self.values
+
+    def __len__(self):
+        self._compact()
+        return len(self.keys)
+
+    def __getstate__(self):
+        self._compact()
+        state = self.__dict__.copy()
+        del state["_pending_keys"], state["_pending_values"], state["_pending"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._pending_keys = []
+        self._pending_values = []
+        self._pending = 0
+
+    def _keys(self, ids):
+        if self.hash_seed is None:
+            return self.rng.random(len(ids))
+        return unit(hash64(ids, self.hash_seed))
+
+    def _push(self, keys, values):
+        self._pending_keys.append(keys)
+        self._pending_values.append(values)
+        self._pending = self._pending + len(keys)
+        if self._pending >= self.k:
+            self._compact()
+
+    def _compact(self):
+        if not self._pending:
+            return
+
+        self.keys = np.concatenate([self.keys, *self._pending_keys])
+        if self.values is None:
+            self.values = np.concatenate(self._pending_values)
+        else:
+            self.values = np.concatenate([self.values, *self._pending_values])
+        self._pending_keys = []
+        self._pending_values = []
+        self._pending = 0
+
+        if self.hash_seed is not None:
+            # a replayed record, or one in two merged shards, has the same key
+            self.keys, first = np.unique(self.keys, return_index=True)
+            self.values = self.values[first]
+
+        if self.k == 0:
+            self.keys, self.values = self.keys[:0], self.values[:0]
+        elif len(self.keys) >= self.k:
+            keep = np.argpartition(self.keys, self.k - 1)[: self.k]
+            self.keys, self.values = self.keys[keep], self.values[keep]
+            self.threshold = self.keys.max()
+
+
+class BottomKSketch:
+    """
+    the K smallest hash keys of the distinct items seen, with their items
+    a single pass answers sample and size queries for any k <= K
+    """
+
+    def __init__(self, K, seed=0):
+        if K < 1:
+            raise ValueError("a sketch keeps at least one key")
+        self.K = K
+        self.seed = seed
+        # sorted and distinct
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.items = None
+
+    def update(self, item):
+        self.update_batch(np.array([item]))
+
+    def update_batch(self, items):
+        items = np.asarray(items)
+        hashes = hash64(items, self.seed)
+        if len(self.hashes) == self.K:
+            survivors = hashes < self.hashes[-1]
+            hashes, items = hashes[survivors], items[survivors]
+        if len(hashes):
+            self._merge(hashes, items)
+
+    def merge(self, other):
+        """the sketch of the union of both streams"""
+
+        if other.seed != self.seed:
+            raise ValueError("only sketches with the same seed can be merged")
+        if other.items is not None:
+            self._merge(other.hashes, other.items)
+        return self
+
+    def sample(self, k=None):
+        """a uniform sample of k of the distinct items"""
+
+        if self.items is None:
+            return np.array([])
+        return self.items[:k]
+
+    def keys(self, k=None):
+        return unit(self.hashes[:k])
+
+    def estimate_count(self, k=None, confidence=0.95):
+        """
+        (estimate, low, high) for the number of distinct items
+        the estimate is (k - 1) / key_k, and key_k * n is about Gamma(k, 1) distributed
+        """
+
+        k = self._size(k)
+        if len(self.hashes) < self.K:
+            # every distinct item is in the sketch
+            return len(self.hashes), len(self.hashes), len(self.hashes)
+
+        key = unit(self.hashes[k - 1])
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        return (
+            (k - 1) / key,
+            _gamma_quantile(k, -z) / key,
+            _gamma_quantile(k, z) / key,
+        )
+
+    def estimate_subset(self, predicate, k=None, confidence=0.95):
+        """
+        (estimate, low, high) for the number of distinct items where predicate is true
+        predicate maps an array of items to a boolean array
+        """
+
+        k = self._size(k)
+        if len(self.hashes) < self.K:
+            matches = int(np.count_nonzero(predicate(self.sample())))
+            return matches, matches, matches
+
+        matches = int(np.count_nonzero(predicate(self.sample(k))))
+
+        count, low, high = self.estimate_count(k, confidence)
+        # wilson interval for the fraction of the sample that matches
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        p = matches / k
+        center = (p + z * z / (2 * k)) / (1 + z * z / k)
+        spread = z * np.sqrt(p * (1 - p) / k + z * z / (4 * k * k)) / (1 + z * z / k)
+        return count * p, low * max(center - spread, 0), high * min(center + spread, 1)
+
+    def jaccard(self, other, k=None):
+        """
+        estimates |A & B| / |A | B| for two sketches with the same seed,
+        from the fraction of the bottom-k of the union that is in both sketches
+        """
+
+        if other.seed != self.seed:
+            raise ValueError("only sketches with the same seed are coordinated")
+
+        k = min(self.K, other.K) if k is None else k
+        union = np.union1d(self.hashes, other.hashes)[:k]
+        if len(union) == 0:
+            return 0.0
+        # a hash below both sketches' k-th hash is in a sketch iff it is in that stream
+        both = np.isin(union, self.hashes) & np.isin(union, other.hashes)
+        return np.count_nonzero(both) / len(union)
+
+    def _size(self, k):
+        """the number of keys an estimate uses, k defaults to K"""
+
+        k = self.K if k is None else k
+        if not 2 <= k <= self.K:
+            raise ValueError(f"estimates need 2 <= k <= K = {self.K}, got {k}")
+        return k
+
+    def _merge(self, hashes, items):
+        if self.items is None:
+            self.items = items[:0]
+        hashes = np.concatenate([self.hashes, hashes])
+        items = np.concatenate([self.items, items])
+        hashes, first = np.unique(hashes, return_index=True)
+        self.hashes = hashes[: self.K]
+        self.items = items[first[: self.K]]
+
+
+def _gamma_quantile(k, z):
+    """the quantile of Gamma(k, 1) at normal score z (wilson-hilferty)"""
+
+    return k * (1 - 1 / (9 * k) + z * np.sqrt(1 / (9 * k))) ** 3
+
+
+def _sketch_shard(args):
+    shard, k, seed, hash_seed = args
+    sketch = ReservoirSketch(k, np.random.default_rng(seed), hash_seed)
+    if isinstance(shard, np.ndarray):
+        chunks = [shard]
+    elif hasattr(shard, "chunks"):
+        chunks = shard.chunks()
+        if hash_seed is not None and hasattr(shard, "chunk_ids"):
+            chunks = zip(shard.chunk_ids(), chunks)
+    else:
+        chunks = shard
+
+    for chunk in chunks:
+        ids = None
+        if isinstance(chunk, tuple):
+            ids, chunk = chunk
+        elif hash_seed is not None:
+            raise ValueError("with a hash_seed, shards need (ids, values) chunks or chunk_ids()")
+        sketch.update_batch(chunk, ids)
+    return sketch
+
+
+def sample_sharded(shards, k, seed, processes=None, hash_seed=None):
+    """
+    samples k items from the union of the shards, one worker per shard
+    each shard is a numpy array, a source with chunks() or an iterable of numpy chunks,
+    and must be picklable
+    with a hash_seed, the sample is the same however the records are sharded;
+    the record ids come from the chunk_ids() of a source, or from chunks of (ids, values) pairs
+    """
+
+    seeds = np.random.SeedSequence(seed).spawn(len(shards))
+    sketch = ReservoirSketch(k, np.random.default_rng(seed), hash_seed)
+    with Pool(processes) as pool:
+        jobs = [(shard, k, s, hash_seed) for shard, s in zip(shards, seeds)]
+        for other in pool.imap_unordered(_sketch_shard, jobs):
+            sketch.merge(other)
+
+    return sketch.sample()
@@ -0,0 +1,139 @@
+import os
+
+import numpy as np
+
+
+class RecordFile:
+    """
+    random access view of a file of fixed width binary records
+    slicing, chunks and shards are zero-copy views of a np.memmap
+    """
+
+    def __init__(self, path, dtype, offset=0, start=0, stop=None):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.offset = offset
+        self.start = start
+        self.stop = stop
+        self._open()
+
+    def _open(self):
+        size = (os.path.getsize(self.path) - self.offset) // self.dtype.itemsize
+        if size > 0:
+            records = np.memmap(self.path, self.dtype, "r", self.offset, (size,))
+        else:
+            records = np.empty(0, self.dtype)
+        self.records = records[self.start : self.stop]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def chunks(self, size=1 << 16):
+        for start in range(0, len(self.records), size):
+            yield self.records[start : start + size]
+
+    def chunk_ids(self, size=1 << 16):
+        """the record numbers in the file of each chunk"""
+
+        for start in range(0, len(self.records), size):
+            stop = min(start + size, len(self.records))
+            yield np.arange(self.start + start, self.start + stop)
+
+    def shards(self, count):
+        """splits the records into count picklable sources"""
+
+        bounds = np.linspace(0, len(self.records), count + 1).astype(int)
+        return [
+            RecordFile(self.path, self.dtype, self.offset, self.start + lo, self.start + hi)
+            for lo, hi in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["records"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+
+class LineFile:
+    """
+    random access view of the lines of a newline delimited file
+    begin and end select a byte range of whole lines, as made by shards
+    """
+
+    def __init__(self, path, block=1 << 24, begin=0, end=None):
+        self.path = path
+        self.block = block
+        self.begin = begin
+        self.end = os.path.getsize(path) if end is None else end
+        self._open()
+
+    def _open(self):
+        size = self.end - self.begin
+        if size > 0:
+            self.data = np.memmap(self.path, np.uint8, "r", self.begin, (size,))
+        else:
+            self.data = np.empty(0, np.uint8)
+
+        # line i spans data[starts[i] : starts[i + 1] - 1]
+        ends = [np.empty(0, np.int64)]
+        for start in range(0, size, self.block):
+            newlines = np.flatnonzero(self.data[start : start + self.block] == ord("\n"))
+            ends.append(newlines + start + 1)
+        if size and self.data[-1] != ord("\n"):
+            ends.append(np.array([size + 1]))
+        self.starts = np.concatenate([[0], *ends])
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index = index + len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.data[self.starts[index] : self.starts[index + 1] - 1].tobytes()
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def chunks(self, size=1 << 16):
+        for start in range(0, len(self), size):
+            stop = min(start + size, len(self))
+            yield np.array([self[i] for i in range(start, stop)], dtype=object)
+
+    def chunk_ids(self, size=1 << 16):
+        """the byte offsets in the file of the lines of each chunk"""
+
+        for start in range(0, len(self), size):
+            yield self.begin + self.starts[start : min(start + size, len(self))]
+
+    def shards(self, count):
+        """splits the lines into count picklable sources"""
+
+        bounds = np.linspace(0, len(self), count + 1).astype(int)
+        # the last line can be missing its newline, so its start is one past the end
+        offsets = np.minimum(self.starts[bounds], len(self.data)) + self.begin
+        return [
+            LineFile(self.path, self.block, int(lo), int(hi))
+            for lo, hi in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def __getstate__(self):
+        # the lines are found again on the other side, instead of sending the file
+        state = self.__dict__.copy()
+        del state["data"], state["starts"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
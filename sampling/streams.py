@@ -0,0 +1,61 @@
+from itertools import chain
+
+import numpy as np
+
+CHUNK = 1 << 16
+
+
+def stream_chunks(n, seed, distribution="uniform", chunk=CHUNK, indexed=False, **params):
+    """
+    reproducible stream of n values as numpy chunks
+    uniform: integers in [0, high), high defaults to n * n
+    zipf: power law integers with exponent a (default 1.5)
+    sorted: increasing values, the worst case order for heap updates
+    duplicates: integers in [0, distinct), distinct defaults to 16
+    indexed chunks are (m, 2) arrays of (index, value) rows
+    """
+
+    draw = _DISTRIBUTIONS[distribution]
+    rng = np.random.default_rng(seed)
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        values = draw(rng, start, stop, n, **params)
+        if indexed:
+            values = np.column_stack([np.arange(start, stop), values])
+        yield values
+
+
+def stream_items(n, seed, distribution="uniform", chunk=CHUNK, indexed=False, **params):
+    """same as stream_chunks, one value (or (index, value) tuple) at a time"""
+
+    chunks = stream_chunks(n, seed, distribution, chunk, indexed, **params)
+    if indexed:
+        return chain.from_iterable(map(tuple, c) for c in map(np.ndarray.tolist, chunks))
+    return chain.from_iterable(map(np.ndarray.tolist, chunks))
+
+
+def _uniform(rng, start, stop, n, high=None):
+    return rng.integers(n * n if high is None else high, size=stop - start)
+
+
+def _zipf(rng, start, stop, n, a=1.5):
+    # rng.zipf is an order of magnitude slower, so use the discretized pareto
+    # distribution, which has the same P(X >= x) ~ x^(1 - a) tail
+    values = (1 - rng.random(stop - start)) ** (-1 / (a - 1))
+    return np.minimum(values, 2.0**62).astype(np.int64)
+
+
+def _sorted(rng, start, stop, n):
+    return np.arange(start, stop)
+
+
+def _duplicates(rng, start, stop, n, distinct=16):
+    return rng.integers(distinct, size=stop - start)
+
+
+_DISTRIBUTIONS = {
+    "uniform": _uniform,
+    "zipf": _zipf,
+    "sorted": _sorted,
+    "duplicates": _duplicates,
+}
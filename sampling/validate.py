@@ -0,0 +1,191 @@
+import argparse
+import json
+import math
+import os
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+from bench import SAMPLERS
+from streams import CHUNK
+
+
+def _stream(kind, n):
+    """the stream 0, 1, ..., n - 1, so a sample is its own inclusion indices"""
+
+    if kind == "items":
+        return iter(range(n))
+    if kind == "chunks":
+        return (np.arange(start, min(start + CHUNK, n)) for start in range(0, n, CHUNK))
+    return np.arange(n)
+
+
+def _count(args):
+    sampler, n, k, reps, seed, positions = args
+    kind, collect = SAMPLERS[sampler]
+    rng = np.random.default_rng(seed)
+
+    counts = np.zeros(n, dtype=np.int64)
+    pairs = np.zeros((len(positions), len(positions)), dtype=np.int64)
+    # which of the tracked positions were sampled, for a block of reps at a time
+    block = np.zeros((min(reps, 1 << 12), len(positions)), dtype=np.int64)
+    lookup = np.full(n, -1)
+    lookup[positions] = np.arange(len(positions))
+
+    for rep in range(reps):
+        sample = np.asarray(collect(_stream(kind, n), n, k, rng), dtype=np.int64)
+        counts += np.bincount(sample, minlength=n)
+
+        row = rep % len(block)
+        tracked = lookup[sample]
+        block[row] = 0
+        block[row, tracked[tracked >= 0]] = 1
+        if row == len(block) - 1 or rep == reps - 1:
+            used = block[: row + 1]
+            pairs += used.T @ used
+
+    return counts, pairs
+
+
+def chi2_sf(x, df):
+    """P(X > x) for X ~ chi2(df), with the wilson-hilferty normal approximation"""
+
+    if df <= 0:
+        return 1.0
+    z = ((x / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def binom_tails(x, n, p):
+    """(P(X <= x), P(X >= x)) for X ~ binomial(n, p), summed exactly from x outwards"""
+
+    if p <= 0 or p >= 1:
+        value = n * p
+        return float(value <= x), float(value >= x)
+
+    log_p, log_q = math.log(p), math.log1p(-p)
+
+    def pmf(i):
+        return math.exp(
+            math.lgamma(n + 1) - math.lgamma(i + 1) - math.lgamma(n - i + 1)
+            + i * log_p + (n - i) * log_q
+        )
+
+    def tail(steps):
+        total = 0.0
+        for i in steps:
+            term = pmf(i)
+            total = total + term
+            # past the mode the terms fall off geometrically
+            if term < total * 1e-17 and abs(i - n * p) > math.sqrt(n * p * (1 - p)):
+                break
+        return min(total, 1.0)
+
+    return tail(range(x, -1, -1)), tail(range(x, n + 1))
+
+
+def _cell_test(observed, reps, p, fixed_total, min_expected=5):
+    """
+    tests cells that each count successes of binomial(reps, p)
+    the chi-square statistic pools consecutive cells until each expects min_expected counts,
+    and the most extreme cell gets an exact binomial test, bonferroni corrected over all the cells
+    """
+
+    group = max(1, math.ceil(min_expected / (reps * p)))
+    starts = np.arange(0, len(observed), group)
+    if len(starts) > 1 and len(observed) - starts[-1] < group:
+        # the short remainder joins the previous bin
+        starts = starts[:-1]
+    pooled = np.add.reduceat(observed, starts)
+    sizes = np.diff(np.append(starts, len(observed)))
+
+    expected = sizes * reps * p
+    stat = float(np.sum((pooled - expected) ** 2 / (expected * (1 - p))))
+    df = len(pooled) - 1 if fixed_total else len(pooled)
+
+    low, _ = binom_tails(int(observed.min()), reps, p)
+    _, high = binom_tails(int(observed.max()), reps, p)
+    return {
+        "chi2": stat,
+        "df": df,
+        "cells_per_bin": group,
+        "p_value": chi2_sf(stat, df),
+        "worst_cell": int(observed.min() if low < high else observed.max()),
+        "p_value_worst": min(1.0, len(observed) * 2 * min(low, high)),
+    }
+
+
+def validate(sampler, n, k, reps, seed=1234, processes=None, pairs=64):
+    """
+    checks that the sampler includes every position with probability k / n,
+    and every pair of a few tracked positions with probability k(k - 1) / (n(n - 1))
+    """
+
+    m = min(k, n)
+    positions = np.concatenate([np.linspace(0, n - 1, pairs), [m - 1, m]])
+    positions = np.unique(positions.astype(int).clip(0, n - 1))
+
+    workers = processes or os.cpu_count()
+    jobs = np.full(workers * 4, reps // (workers * 4))
+    jobs[: reps % len(jobs)] += 1
+    jobs = jobs[jobs > 0]
+    seeds = np.random.SeedSequence(seed).spawn(len(jobs))
+
+    counts = np.zeros(n, dtype=np.int64)
+    together = np.zeros((len(positions), len(positions)), dtype=np.int64)
+    with Pool(processes) as pool:
+        args = [(sampler, n, k, int(r), s, positions) for r, s in zip(jobs, seeds)]
+        for c, t in pool.imap_unordered(_count, args):
+            counts += c
+            together += t
+
+    p = m / n
+    single = _cell_test(counts, reps, p, fixed_total=True) if p < 1 else None
+
+    q = m * (m - 1) / (n * (n - 1))
+    upper = together[np.triu_indices(len(positions), 1)]
+    if 0 < q < 1:
+        pairwise = _cell_test(upper, reps, q, fixed_total=False)
+    else:
+        pairwise = None
+
+    return {
+        "sampler": sampler,
+        "n": n,
+        "k": k,
+        "reps": reps,
+        "inclusion": single,
+        "pairwise": pairwise,
+        "tracked_positions": positions.tolist(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="check that a sampler is uniform")
+    parser.add_argument("--sampler", nargs="+", default=list(SAMPLERS))
+    parser.add_argument("--n", type=int, default=10_000)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--reps", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--alpha", type=float, default=1e-3)
+    args = parser.parse_args(argv)
+
+    failed = False
+    reports = []
+    for sampler in args.sampler:
+        report = validate(sampler, args.n, args.k, args.reps, args.seed, args.processes)
+        tests = [report["inclusion"], report["pairwise"]]
+        report["passed"] = all(
+            t is None or min(t["p_value"], t["p_value_worst"]) >= args.alpha for t in tests
+        )
+        failed = failed or not report["passed"]
+        reports.append(report)
+
+    json.dump(reports, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import heapq as q
+
+import numpy as np
+
+
+def sample_weighted_jumps(stream, k, rng):
+    """
+    weighted reservoir sampling with exponential jumps (A-ExpJ)
+    the stream yields (value, weight), and items are kept by the k largest keys u^(1/w)
+    """
+
+    # min heap of (log key, value), so the root is the smallest kept key
+    reservoir = []
+    # weight left to skip before the next item enters the reservoir
+    remaining = 0
+    for value, weight in stream:
+        if len(reservoir) < k:
+            key = np.log(rng.random()) / weight
+            q.heappush(reservoir, (key, value))
+            if len(reservoir) == k:
+                remaining = np.log(rng.random()) / reservoir[0][0]
+            continue
+
+        remaining = remaining - weight
+        if remaining > 0:
+            continue
+
+        # key ~ U(min_key^w, 1)^(1/w)
+        min_key = reservoir[0][0]
+        key = np.log(rng.uniform(np.exp(min_key * weight), 1)) / weight
+        q.heappushpop(reservoir, (key, value))
+        remaining = np.log(rng.random()) / reservoir[0][0]
+
+    return np.array([v for _, v in reservoir])
+
+
+def sample_weighted_chunks(chunks, k, rng):
+    """same as sample_weighted_jumps, but the stream yields (values, weights) numpy chunks"""
+
+    reservoir = []
+    remaining = 0
+    for values, weights in chunks:
+        values = np.asarray(values)
+        weights = np.asarray(weights, dtype=float)
+
+        start = 0
+        if len(reservoir) < k:
+            start = min(k - len(reservoir), len(values))
+            keys = np.log(rng.random(start)) / weights[:start]
+            for key, value in zip(keys, values[:start]):
+                q.heappush(reservoir, (key, value))
+            if len(reservoir) < k:
+                continue
+            remaining = np.log(rng.random()) / reservoir[0][0]
+
+        # the jumps land on the first item whose running weight passes remaining
+        total = np.cumsum(weights[start:])
+        offset = 0
+        while True:
+            i = np.searchsorted(total, offset + remaining)
+            if i == len(total):
+                break
+
+            index = start + i
+            weight = weights[index]
+            min_key = reservoir[0][0]
+            key = np.log(rng.uniform(np.exp(min_key * weight), 1)) / weight
+            q.heappushpop(reservoir, (key, values[index]))
+
+            offset = total[i]
+            remaining = np.log(rng.random()) / reservoir[0][0]
+
+        if len(total):
+            remaining = remaining - (total[-1] - offset)
+
+    return np.array([v for _, v in reservoir])
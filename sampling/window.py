@@ -0,0 +1,164 @@
+import heapq as q
+
+import numpy as np
+
+
+class WindowSketch:
+    """
+    bottom-k sample of the last `count` items, or of the items in the last `seconds`
+    an item is only kept while fewer than k later items have smaller keys,
+    since it can not be in the bottom-k of any later window otherwise
+    this keeps about k log(W / k) candidates in expectation
+    """
+
+    def __init__(self, k, rng, count=None, seconds=None, bucket=1 << 12):
+        if (count is None) == (seconds is None):
+            raise ValueError("exactly one of count and seconds must be given")
+
+        self.k = k
+        self.rng = rng
+        self.count = count
+        self.seconds = seconds
+        # single updates are buffered and merged in buckets of this size
+        self.bucket = bucket
+        self.seen = 0
+
+        # candidates in arrival order
+        self.stamps = np.empty(0)
+        self.keys = np.empty(0)
+        self.values = None
+        self._pending_values = []
+        self._pending_stamps = []
+        # candidates added since the last exact prune
+        self._unpruned = 0
+
+    def update(self, value, time=None):
+        self._pending_values.append(value)
+        self._pending_stamps.append(self.seen if time is None else time)
+        self.seen = self.seen + 1
+        if len(self._pending_values) >= self.bucket:
+            self._flush()
+
+    def update_batch(self, values, times=None):
+        values = np.asarray(values)
+        if times is None:
+            times = np.arange(self.seen, self.seen + len(values))
+        self.seen = self.seen + len(values)
+
+        if len(self._pending_values) + len(values) < self.bucket:
+            # small batches are buffered like single updates
+            self._pending_values.extend(values)
+            self._pending_stamps.extend(np.asarray(times, dtype=float))
+            return
+
+        self._flush()
+        self._insert(values, np.asarray(times, dtype=float))
+
+    def sample(self, now=None):
+        """
+        the bottom-k of the current window
+        for time windows, now defaults to the newest timestamp seen
+        """
+
+        self._flush()
+        self._expire(now)
+        if self.values is None or len(self.keys) == 0:
+            return np.array([])
+
+        if len(self.keys) <= self.k:
+            return self.values
+        keep = np.argpartition(self.keys, self.k - 1)[: self.k]
+        return self.values[np.sort(keep)]
+
+    def __len__(self):
+        self._flush()
+        return len(self.keys)
+
+    def _flush(self):
+        if not self._pending_values:
+            return
+
+        values = np.array(self._pending_values)
+        stamps = np.array(self._pending_stamps, dtype=float)
+        self._pending_values = []
+        self._pending_stamps = []
+        self._insert(values, stamps)
+
+    def _insert(self, values, stamps):
+        if len(values) == 0:
+            return
+
+        keys = self.rng.random(len(values))
+        survivors = _dominated(keys, self.k, rough=True)
+        keys, values, stamps = keys[survivors], values[survivors], stamps[survivors]
+
+        if self.values is None:
+            self.values = values
+        else:
+            self.values = np.concatenate([self.values, values])
+        self.keys = np.concatenate([self.keys, keys])
+        self.stamps = np.concatenate([self.stamps, stamps])
+
+        # the exact pass is over every candidate, so it waits for a bucket of new ones
+        # extra candidates are dominated, so they never change a sample
+        self._unpruned = self._unpruned + len(keys)
+        if self._unpruned >= self.bucket:
+            keep = _dominated(self.keys, self.k, rough=False)
+            self.keys, self.values, self.stamps = (
+                self.keys[keep],
+                self.values[keep],
+                self.stamps[keep],
+            )
+            self._unpruned = 0
+        self._expire(None)
+
+    def _expire(self, now):
+        if self.count is not None:
+            start = np.searchsorted(self.stamps, self.seen - self.count, side="left")
+        else:
+            if now is None:
+                now = self.stamps[-1] if len(self.stamps) else 0
+            start = np.searchsorted(self.stamps, now - self.seconds, side="right")
+
+        if start:
+            self.keys = self.keys[start:]
+            self.values = self.values[start:]
+            self.stamps = self.stamps[start:]
+
+
+def _dominated(keys, k, rough, block=1 << 12):
+    """
+    mask of the keys with fewer than k smaller keys after them
+    rough only compares against whole later blocks, so it may keep extra keys
+    """
+
+    keep = np.ones(len(keys), dtype=bool)
+    if k == 0:
+        keep[:] = False
+        return keep
+
+    if rough:
+        # bottom-k of everything after the current block
+        suffix = np.empty(0)
+        for stop in range(len(keys), 0, -block):
+            start = max(stop - block, 0)
+            chunk = keys[start:stop]
+            if len(suffix) == k:
+                keep[start:stop] = chunk < suffix.max()
+            suffix = np.concatenate([suffix, chunk])
+            if len(suffix) > k:
+                suffix = np.partition(suffix, k - 1)[:k]
+        return keep
+
+    # max heap of the k smallest keys after i
+    heap = []
+    for i in range(len(keys) - 1, -1, -1):
+        key = -keys[i]
+        if len(heap) < k:
+            q.heappush(heap, key)
+        elif key > heap[0]:
+            q.heappushpop(heap, key)
+        else:
+            keep[i] = False
+
+    return keep